@@ -1,15 +1,94 @@
 # Translator Base
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 from google.cloud import translate_v2 as translate
 
+# Google caps one translate request at 128 segments
+_BATCH_LIMIT = 128
+# Concurrent in-flight requests; the GIL releases during socket I/O and the
+# google-auth transport is thread-safe, so threads are enough here
+_MAX_WORKERS = 16
+# Bound on the (text, lang) -> translation memo; oldest entries fall out
+_MEMO_MAX = 4096
+
 class TranslatorBase:
     def __init__(self, credential_json="translate-tool.json"):
         try:
             self.client = translate.Client.from_service_account_json(credential_json)
         except Exception as e:
             raise RuntimeError(f"Error init translate client: {e}")
+        self._memo: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+    # -- memo: re-selecting the same phrase must not cost another paid call --
+    def _memo_get(self, text: str, target_language: str):
+        key = (text, target_language)
+        val = self._memo.get(key)
+        if val is not None:
+            self._memo.move_to_end(key)
+        return val
+
+    def _memo_put(self, text: str, target_language: str, translated: str):
+        self._memo[(text, target_language)] = translated
+        if len(self._memo) > _MEMO_MAX:
+            self._memo.popitem(last=False)
+
+    def load_cache(self, path: str):
+        try:
+            with open(path, "rb") as f:
+                self._memo = OrderedDict(pickle.load(f))
+        except Exception:
+            pass
+
+    def save_cache(self, path: str):
+        try:
+            with open(path, "wb") as f:
+                pickle.dump(list(self._memo.items()), f)
+        except Exception:
+            pass
 
     def translate_text(self, text: str, target_language: str = "vi") -> str:
         if not text.strip():
             return ""
+        cached = self._memo_get(text, target_language)
+        if cached is not None:
+            return cached
         result = self.client.translate(text, target_language=target_language)
-        return result["translatedText"]
+        translated = result["translatedText"]
+        self._memo_put(text, target_language, translated)
+        return translated
+
+    def translate_batch(self, texts: list[str], target_language: str = "vi") -> list[str]:
+        """Translate many strings in as few API round-trips as possible.
+
+        Empty/whitespace inputs come back as "" without being sent. Results
+        keep the order of the inputs."""
+        results = ["" for _ in texts]
+        todo = []
+        for i, t in enumerate(texts):
+            if not t.strip():
+                continue
+            cached = self._memo_get(t, target_language)
+            if cached is not None:
+                results[i] = cached
+            else:
+                todo.append((i, t))
+        chunks = [todo[s:s + _BATCH_LIMIT] for s in range(0, len(todo), _BATCH_LIMIT)]
+
+        def _send(chunk):
+            return self.client.translate(
+                [t for _, t in chunk], target_language=target_language
+            )
+
+        if len(chunks) <= 1:
+            translated_chunks = [_send(c) for c in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(_MAX_WORKERS, len(chunks))) as ex:
+                translated_chunks = list(ex.map(_send, chunks))
+
+        for chunk, translated in zip(chunks, translated_chunks):
+            for (i, t), r in zip(chunk, translated):
+                results[i] = r["translatedText"]
+                self._memo_put(t, target_language, results[i])
+        return results
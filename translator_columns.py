@@ -1,20 +1,214 @@
 # Translate columns in docx file
+import atexit
+import glob
 import os
+import queue
 import re
+import socket
 import tempfile
+import threading
+import time
 import shutil
 import subprocess
 from typing import Tuple
-from bs4 import BeautifulSoup
 import mammoth
 from docx.document import Document as DocxDocument
 from translator_base import TranslatorBase
 from dotenv import load_dotenv
-import os
 
 load_dotenv()
 
+# MathJax config is read once at import, right after load_dotenv
+_MATHJAX_SRC = os.getenv("MATHJAX_SRC")
+_MATHJAX_ASYNC = os.getenv("MATHJAX_ASYNC", "true")
+_MATHJAX_INTEGRITY = os.getenv("MATHJAX_INTEGRITY")
+_MATHJAX_CROSSORIGIN = os.getenv("MATHJAX_CROSSORIGIN", "anonymous")
+
+# Resolve the LibreOffice binary once instead of walking $PATH per conversion
+_SOFFICE_BIN = shutil.which("soffice") or shutil.which("libreoffice")
+
+# Trên Linux ưu tiên /dev/shm: HTML trung gian nằm trong RAM, không chạm disk
+_TMP_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# unoserver keeps one LibreOffice alive so each conversion skips the ~2-3s
+# soffice startup; when it is not installed we fall back to one-shot soffice
+_UNOSERVER_BIN = shutil.which("unoserver")
+_UNOCONVERT_BIN = shutil.which("unoconvert")
+_UNOSERVER_PORT = "2003"
+# A hung LibreOffice must not wedge the app; give any conversion this long
+_CONVERT_TIMEOUT = 120
+
+
+class _LibreOfficePool:
+    """Pool of unoserver workers on distinct ports/profiles. LibreOffice
+    serializes work within one process, so throughput only scales by running
+    several isolated instances and dispatching round-robin."""
+
+    def __init__(self, size=None):
+        self._size = size or min(4, os.cpu_count() or 1)
+        self._procs = []
+        self._workers = {}  # port -> proc, để convert() biết chủ cổng còn sống không
+        self._ports = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                # Worker có thể đã chết từ lúc spawn (cổng bận, unoserver
+                # lỗi...); còn sống con nào thì mới nhận việc
+                return any(p.poll() is None for p in self._procs)
+            self._started = True
+            if not _UNOSERVER_BIN or not _UNOCONVERT_BIN:
+                return False
+            base = int(_UNOSERVER_PORT)
+            for i in range(self._size):
+                port = str(base + i)
+                profile = os.path.join(tempfile.gettempdir(), f"lo-profile-{port}")
+                proc = subprocess.Popen(
+                    [_UNOSERVER_BIN, "--port", port, "--interface", "127.0.0.1",
+                     "--user-installation", profile],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                self._procs.append(proc)
+                self._workers[port] = proc
+                self._ports.put(port)
+            return True
+
+    @staticmethod
+    def _wait_port(port, timeout=15):
+        # Chờ server mở cổng
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", int(port)), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+
+    def convert(self, docx_path):
+        # Nhận HTML qua stdout ("-"), không ghi file trung gian
+        port = self._ports.get()
+        with self._lock:
+            proc = self._workers.get(port)
+            if proc is None or proc.poll() is not None:
+                # Worker chết: loại hẳn khỏi pool (không trả cổng lại queue)
+                # và fail ngay thay vì đợi _wait_port 15s cho mỗi lần convert
+                self._workers.pop(port, None)
+                if proc in self._procs:
+                    self._procs.remove(proc)
+                raise RuntimeError(f"unoserver worker on port {port} is dead")
+        try:
+            self._wait_port(port)
+            proc = subprocess.run(
+                [_UNOCONVERT_BIN, "--port", port,
+                 "--convert-to", "html", docx_path, "-"],
+                check=True, timeout=_CONVERT_TIMEOUT,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            return proc.stdout.decode("utf-8", errors="ignore")
+        finally:
+            self._ports.put(port)
+
+    def stop(self):
+        for proc in self._procs:
+            if proc.poll() is None:
+                proc.terminate()
+        self._procs.clear()
+        self._workers.clear()
+
+# Style scrubbing runs textually, but ONLY inside style="..." attribute values
+# and <style> bodies — never over the whole document string, where the same
+# patterns would eat visible prose ("position: keep your feet planted", ...).
+_COLUMN_RE = re.compile(
+    r"(?:-webkit-)?column-(?:count|width|gap|fill)\s*:\s*[^;]+;?\s*",
+    re.IGNORECASE,
+)
+# Anchor đầu dùng lookbehind (không nuốt dấu ;) để hai property xấu đứng
+# cạnh nhau đều bị xoá trong một lượt sub
+_BAD_PROPS_ALL = re.compile(
+    r"(?:^|(?<=;))\s*(?:"
+    r"(?:-webkit-)?position|top|left|right|bottom|z-index|"
+    r"text-wrap|wrap-(?:flow|through|margin|distance)|"
+    r"mso-position-[^:;]+|mso-wrap-[^:;]+"
+    r")\s*:\s*[^;]+;?",
+    re.IGNORECASE,
+)
+_BAD_PROPS_TEXT = re.compile(
+    r"(?:^|(?<=;))\s*(?:float|clear)\s*:\s*[^;]+;?",
+    re.IGNORECASE,
+)
+_DOUBLE_SEMI = re.compile(r";{2,}")
+_HEAD_CLOSE_RE = re.compile(r"</head>", re.IGNORECASE)
+# Tag stripper for the plain-text capture; script/style bodies go too
+_TAG_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1>|<[^>]+>", re.S | re.I)
+_CR_RE = re.compile(r"\r\n?")
+# style attribute của MỌI tag (giữ tên tag để biết có phải text tag không)
+_STYLE_ATTR_TAG_RE = re.compile(
+    r"(<(\w+)\b[^>]*?\sstyle=\")([^\"]*)(\")",
+    re.IGNORECASE,
+)
+_STYLE_TAG_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.S | re.IGNORECASE)
+# Prefilter rẻ: style không nhắc tới các property này thì khỏi chạy regex
+_STYLE_KEYWORDS = (
+    "column-", "position", "top", "left", "right", "bottom", "z-index",
+    "float", "clear", "text-wrap", "wrap-", "mso-",
+)
+_MEDIA_TAG_RE = re.compile(r"<(img|figure|svg|object)\b([^>]*?)(/?)>", re.IGNORECASE)
+_STYLE_ATTR_RE = re.compile(r"\sstyle=\"([^\"]*)\"", re.IGNORECASE)
+# Giữ additions cho img/figure/svg/object, nhưng không override float
+_MEDIA_ADDITIONS = ";".join([
+    "display:block",  # Mặc định block, nhưng nếu có float sẽ override
+    "position:static !important",  # Chỉ static nếu không cần absolute
+    "z-index:auto",
+    "top:auto", "left:auto", "right:auto", "bottom:auto",
+    "max-width:100%",
+    "height:auto",
+])
+
+# CSS tĩnh chèn vào <head>: một block duy nhất, dựng sẵn lúc import
+_STATIC_CSS_BLOB = """
+    *[style*="position"]:not(img):not(figure):not(table) {
+        position: static !important;
+        z-index: auto !important;
+        top: auto !important; left: auto !important; right: auto !important; bottom: auto !important;
+    }
+    img, figure, svg, object, table {
+        z-index: auto !important;
+        max-width: 100%;
+        height: auto;
+        display: block;  /* Có thể override bằng float nếu có */
+    }
+    html, body {
+        width: 100% !important;
+        margin: 0;
+        padding: 0;
+        column-count: 1 !important;
+        -webkit-column-count: 1 !important;
+        column-width: auto !important;
+        -webkit-column-width: auto !important;
+        column-gap: normal !important;
+        -webkit-column-gap: normal !important;
+        column-fill: auto !important;
+        -webkit-column-fill: auto !important;
+    }
+    div, p { break-inside: avoid; }
+    img, table, figure { max-width: 100%; height: auto; }
+"""
+
+# MathJax for rendering MathML equations + static CSS, dựng sẵn lúc import
+_STATIC_HEAD_BLOB = (
+    f"<style>{_STATIC_CSS_BLOB}</style>"
+    f'<script src="{_MATHJAX_SRC}"'
+    f' async="{_MATHJAX_ASYNC}"'
+    f' integrity="{_MATHJAX_INTEGRITY}"'
+    f' crossorigin="{_MATHJAX_CROSSORIGIN}"></script>'
+)
+
+
 class TranslatorColumns(TranslatorBase):
+    _lo_pool = _LibreOfficePool()
+
     def __init__(self, credential_json="translate-tool.json"):
         super().__init__(credential_json)
         self._tmp_html_dir = None
@@ -32,7 +226,7 @@ class TranslatorColumns(TranslatorBase):
         self._all_tmp_dirs.clear()
 
     def _save_doc_to_tmp(self, doc):
-        tmpdir = tempfile.mkdtemp(prefix="docx_html_")
+        tmpdir = tempfile.mkdtemp(prefix="docx_html_", dir=_TMP_ROOT)
         self._all_tmp_dirs.append(tmpdir)
         self._tmp_html_dir = tmpdir
         tmp_path = os.path.join(tmpdir, "temp.docx")
@@ -46,25 +240,36 @@ class TranslatorColumns(TranslatorBase):
             with open(tmp_path, "wb") as f:
                 f.write(doc)
         elif isinstance(doc, str) and os.path.isfile(doc):
-            shutil.copy(doc, tmp_path)
+            # Hardlink là đủ: LibreOffice chỉ đọc file, không sửa
+            try:
+                os.link(doc, tmp_path)
+            except OSError:  # cross-filesystem (e.g. /dev/shm) or Windows
+                shutil.copy(doc, tmp_path)
         else:
             raise TypeError(f"Unsupported doc type: {type(doc)}")
         return tmp_path
 
     def _export_with_libreoffice(self, docx_path):
         tmpdir = self._tmp_html_dir
-        soffice = shutil.which("soffice") or shutil.which("libreoffice")
-        if not soffice:
+
+        if self._lo_pool.start():
+            try:
+                return self._lo_pool.convert(docx_path)
+            except Exception:
+                pass  # daemon chết/treo thì vẫn còn soffice một-lần bên dưới
+
+        if not _SOFFICE_BIN:
             raise FileNotFoundError("LibreOffice not found")
 
         subprocess.run(
-            [soffice, "--headless", "--convert-to", "html", docx_path, "--outdir", tmpdir],
-            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            [_SOFFICE_BIN, "--headless", "--convert-to", "html", docx_path, "--outdir", tmpdir],
+            check=True, timeout=_CONVERT_TIMEOUT,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
         )
-        html_files = [f for f in os.listdir(tmpdir) if f.lower().endswith(".html")]
+        html_files = glob.glob(os.path.join(tmpdir, "*.html")) + glob.glob(os.path.join(tmpdir, "*.HTML"))
         if not html_files:
             raise RuntimeError("LibreOffice failed to convert file HTML")
-        html_path = os.path.join(tmpdir, html_files[0])
+        html_path = html_files[0]
         with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
             html = f.read()
         return html
@@ -75,99 +280,53 @@ class TranslatorColumns(TranslatorBase):
         html = f"<html><head><meta charset='utf-8'></head><body>{content}</body></html>"
         return html
 
-    def _strip_multicolumn_styles(self, soup: BeautifulSoup):
-        for tag in soup.find_all(style=True):
-            style = tag.get("style") or ""
-            cleaned = re.sub(
-                r"(?:-webkit-)?column-(?:count|width|gap|fill)\s*:\s*[^;]+;?\s*",
-                "",
-                style,
-                flags=re.IGNORECASE
-            )
-            if cleaned.strip():
-                tag["style"] = cleaned
-            else:
-                del tag["style"]
-
-        for style_tag in soup.find_all("style"):
-            css = style_tag.string or ""
-            cleaned_css = re.sub(
-                r"(?:-webkit-)?column-(?:count|width|gap|fill)\s*:\s*[^;]+;?\s*",
-                "",
-                css,
-                flags=re.IGNORECASE
-            )
-            style_tag.string = cleaned_css
-
-    def _normalize_floats_and_absolute(self, soup: BeautifulSoup):
-            # Giữ float và clear cho img, figure, table để tránh làm vỡ layout LaTeX
-        bad_props_all = re.compile(
-            r"(?:^|;)\s*(?:"
-            r"(?:-webkit-)?position|top|left|right|bottom|z-index|"
-            r"text-wrap|wrap-(?:flow|through|margin|distance)|"
-            r"mso-position-[^:;]+|mso-wrap-[^:;]+"
-            r")\s*:\s*[^;]+;?",
-            re.IGNORECASE,
-        )
-        bad_props_text_only = re.compile(
-            r"(?:^|;)\s*(?:float|clear)\s*:\s*[^;]+;?",
-            re.IGNORECASE,
-        )
+    def _scrub_raw_html(self, html: str) -> str:
+        """Textual pass over the raw HTML: drop multi-column and absolute
+        positioning properties from style attributes, remove float/clear from
+        text tags, strip column props from <style> CSS and decorate media tags.
+        Chỉ đụng vào style context — text của tài liệu giữ nguyên."""
+
+        def _clean_attr(m):
+            tag = m.group(2).lower()
+            style = m.group(3)
+            # Đa số style không chứa property cần xoá; test chứa chuỗi rẻ hơn re.sub
+            sl = style.lower()
+            if not any(kw in sl for kw in _STYLE_KEYWORDS):
+                return m.group(0)
+            s = _COLUMN_RE.sub("", style)
+            s = _BAD_PROPS_ALL.sub("", s)
+            if tag in ("span", "div", "p"):
+                # Chỉ remove float cho text tags
+                s = _BAD_PROPS_TEXT.sub("", s)
+            s = _DOUBLE_SEMI.sub(";", s).strip(" ;")
+            return m.group(1) + s + m.group(4)
+
+        html = _STYLE_ATTR_TAG_RE.sub(_clean_attr, html)
+
+        def _clean_css(m):
+            return m.group(1) + _COLUMN_RE.sub("", m.group(2)) + m.group(3)
 
-        def _clean_style(style: str, is_text_tag: bool) -> str:
-            if not style:
-                return style
-            s = re.sub(bad_props_all, ";", style)
-            if is_text_tag:
-                s = re.sub(bad_props_text_only, ";", s)
-            s = re.sub(r";{2,}", ";", s).strip(" ;")
-            return s
-
-        # Áp dụng cho tất cả tags có style
-        for tag in soup.find_all(style=True):
-            is_text_tag = tag.name in ("span", "div", "p")  # Chỉ remove float cho text tags
-            style = tag.get("style", "")
-            cleaned = _clean_style(style, is_text_tag)
-            if cleaned:
-                tag["style"] = cleaned
+        html = _STYLE_TAG_RE.sub(_clean_css, html)
+
+        def _decorate_media(m):
+            attrs = m.group(2)
+            sm = _STYLE_ATTR_RE.search(attrs)
+            if sm:
+                merged = ";".join([s for s in (sm.group(1), _MEDIA_ADDITIONS) if s]).strip(";")
+                attrs = attrs[:sm.start()] + ' style="%s"' % merged + attrs[sm.end():]
             else:
-                del tag["style"]
-
-        # Giữ additions cho img/figure/svg/object, nhưng không override float
-        for tag in soup.find_all(["img", "figure", "svg", "object"]):
-            existing = tag.get("style", "")
-            additions = [
-                "display:block",  # Mặc định block, nhưng nếu có float sẽ override
-                "position:static !important",  # Chỉ static nếu không cần absolute
-                "z-index:auto",
-                "top:auto", "left:auto", "right:auto", "bottom:auto",
-                "max-width:100%",
-                "height:auto",
-            ]
-            merged = ";".join([s for s in (existing, ";".join(additions)) if s]).strip(";")
-            tag["style"] = merged
-
-        # Extra CSS: Không override float cho img/figure/table
-        extra_css = soup.new_tag("style")
-        extra_css.string = """
-            *[style*="position"]:not(img):not(figure):not(table) {
-                position: static !important;
-                z-index: auto !important;
-                top: auto !important; left: auto !important; right: auto !important; bottom: auto !important;
-            }
-            img, figure, svg, object, table {
-                z-index: auto !important;
-                max-width: 100%;
-                height: auto;
-                display: block;  /* Có thể override bằng float nếu có */
-            }
-        """
-        if soup.head:
-            soup.head.append(extra_css)
-        else:
-            head_tag = soup.new_tag("head")
-            head_tag.append(extra_css)
-            soup.insert(0, head_tag)
+                attrs += ' style="%s"' % _MEDIA_ADDITIONS
+            return "<%s%s%s>" % (m.group(1), attrs, m.group(3))
+
+        html = _MEDIA_TAG_RE.sub(_decorate_media, html)
+        return html
+
+    @staticmethod
+    def _inject_head(html: str, blob: str) -> str:
+        """Splice the static head payload in with a string edit — no tree."""
+        if _HEAD_CLOSE_RE.search(html):
+            return _HEAD_CLOSE_RE.sub(lambda m: blob + m.group(0), html, count=1)
+        return "<head>" + blob + "</head>" + html
 
     def docx_to_html(self, doc) -> Tuple[str, str]:
         docx_path = self._save_doc_to_tmp(doc)
@@ -181,53 +340,16 @@ class TranslatorColumns(TranslatorBase):
             except Exception:
                 pass
 
-        soup = BeautifulSoup(html, "html.parser")
-
-        self._strip_multicolumn_styles(soup)
-
-        self._normalize_floats_and_absolute(soup)
-
-        base_css = soup.new_tag("style")
-        base_css.string = """
-            html, body {
-                width: 100% !important;
-                margin: 0;
-                padding: 0;
-                column-count: 1 !important;
-                -webkit-column-count: 1 !important;
-                column-width: auto !important;
-                -webkit-column-width: auto !important;
-                column-gap: normal !important;
-                -webkit-column-gap: normal !important;
-                column-fill: auto !important;
-                -webkit-column-fill: auto !important;
-            }
-            div, p { break-inside: avoid; }
-            img, table, figure { max-width: 100%; height: auto; }
-        """
-        if soup.head:
-            soup.head.append(base_css)
-        else:
-            head_tag = soup.new_tag("head")
-            head_tag.append(base_css)
-            soup.insert(0, head_tag)
-
-        # Add MathJax for rendering MathML equations
-        mathjax_script = soup.new_tag("script")
-        mathjax_script["src"] = os.getenv("MATHJAX_SRC")
-        mathjax_script["async"] = os.getenv("MATHJAX_ASYNC", "true")
-        mathjax_script["integrity"] = os.getenv("MATHJAX_INTEGRITY")
-        mathjax_script["crossorigin"] = os.getenv("MATHJAX_CROSSORIGIN", "anonymous")
-        if soup.head:
-            soup.head.append(mathjax_script)
-        else:
-            head_tag = soup.new_tag("head")
-            head_tag.append(mathjax_script)
-            soup.insert(0, head_tag)
-        
+        html = self._scrub_raw_html(html)
+
+        html = self._inject_head(html, _STATIC_HEAD_BLOB)
+
         try:
-            self._last_html_plain = soup.get_text().replace("\r\n", "\n").replace("\r", "\n")
+            self._last_html_plain = _CR_RE.sub("\n", _TAG_RE.sub("", html))
         except Exception:
             self._last_html_plain = ""
 
-        return str(soup), self._tmp_html_dir
+        return html, self._tmp_html_dir
+
+
+atexit.register(TranslatorColumns._lo_pool.stop)
@@ -1,20 +1,217 @@
 # UI
+import hashlib
+import json
+import os
+import re
+import shutil
 import sys
-from io import BytesIO
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QSplitter, QPushButton,
     QComboBox, QLabel, QHBoxLayout, QFileDialog, QMessageBox
 )
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineScript
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import (
+    QFile, QIODevice, QObject, QRunnable, QThreadPool, QTimer, QUrl,
+    pyqtSignal, pyqtSlot,
+)
 from docx import Document
 from translator_columns import TranslatorColumns
 from utils import replace_text_in_paragraph
 
 
+_WS_RE = re.compile(r"\s+")
+
+# Trần cho segment_map: phiên dịch dài không được phình bộ nhớ vô hạn
+_SEGMENT_MAP_MAX = 2048
+
+# Trần cho render cache: mỗi entry là một chuỗi HTML nhiều MB kèm một tmpdir
+# (nằm trên /dev/shm, tức là RAM) nên phải evict chứ không giữ cả phiên
+_HTML_CACHE_MAX = 8
+
+# Danh sách ngôn ngữ đích, cố định ở module scope; dict tra ngược code -> tên
+_LANGS = (
+    ("English", "en"),
+    ("Vietnamese", "vi"),
+    ("French", "fr"),
+    ("Spanish", "es"),
+    ("German", "de"),
+    ("Chinese (Simplified)", "zh-CN"),
+)
+_LANG_BY_CODE = {code: name for name, code in _LANGS}
+
+
+def _norm(s: str) -> str:
+    """Collapse all whitespace runs to single spaces (one C-level pass)."""
+    # Fast path: đa số chuỗi đã sạch — vài phép test membership rẻ hơn re.sub;
+    # phải phủ đủ mọi ký tự \s ASCII (kể cả \x0b/\x0c), isascii chặn luôn
+    # các khoảng trắng unicode (\xa0...)
+    if s.isascii() and "  " not in s and not any(c in s for c in "\t\n\r\x0b\x0c"):
+        return s.strip()
+    return _WS_RE.sub(" ", s).strip()
+
+
 def _norm_key(s: str) -> str:
     """Create normalized key for snippet (remove extra spaces, limit length)."""
-    return " ".join((s or "").split())[:400]
+    return _norm(s or "")[:400]
+
+
+# JS đo offset selection — dựng một lần ở module scope, không build lại mỗi event
+_SEL_JS = """
+(function() {
+    var sel = window.getSelection();
+    if (sel.rangeCount > 0) {
+        var r = sel.getRangeAt(0);
+        var pre = r.cloneRange();
+        pre.selectNodeContents(document.body);
+        pre.setEnd(r.startContainer, r.startOffset);
+        var start = pre.toString().length;
+        var end = start + r.toString().length;
+        return [start, end];
+    }
+    return [-1, -1];
+})();
+"""
+
+# Trang tự đẩy selection qua QWebChannel: không còn một lượt runJavaScript
+# (marshal + parse + execute) cho mỗi lần selectionChanged
+_SELECTION_CHANNEL_JS = """
+new QWebChannel(qt.webChannelTransport, function(channel) {
+    var sink = channel.objects.selectionSink;
+    var timer = null;
+    function measure() {
+        timer = null;
+        var sel = window.getSelection();
+        if (sel.rangeCount > 0) {
+            var r = sel.getRangeAt(0);
+            var pre = r.cloneRange();
+            pre.selectNodeContents(document.body);
+            pre.setEnd(r.startContainer, r.startOffset);
+            var start = pre.toString().length;
+            sink.setSelection(start, start + r.toString().length);
+        } else {
+            sink.setSelection(-1, -1);
+        }
+    }
+    // Debounce 60ms: khi kéo chuột selectionchange bắn liên tục,
+    // chỉ đo và gửi trạng thái cuối cùng
+    document.addEventListener("selectionchange", function() {
+        if (timer) clearTimeout(timer);
+        timer = setTimeout(measure, 60);
+    });
+});
+"""
+
+
+class _SelectionSink(QObject):
+    """Nhận offset selection do trang đẩy sang qua QWebChannel."""
+
+    def __init__(self, on_selection):
+        super().__init__()
+        self._on_selection = on_selection
+
+    @pyqtSlot(int, int)
+    def setSelection(self, start, end):
+        self._on_selection(start, end)
+
+
+# Thay text của từng paragraph ngay trong DOM: mỗi cặp [old, new] phải khớp
+# đúng một phần tử (sâu nhất) KHÔNG có con element — gán textContent lên phần
+# tử có inline markup (strong/em/link/MathML) sẽ san phẳng định dạng mà bản
+# render đầy đủ vẫn giữ; trả về false để Python reload toàn bộ nếu không
+_PATCH_PARAS_JS = """
+(function(pairs) {
+    function norm(s) { return (s || "").replace(/\\s+/g, " ").trim(); }
+    var all = document.body.getElementsByTagName("*");
+    for (var k = 0; k < pairs.length; k++) {
+        var target = norm(pairs[k][0]);
+        if (!target) return false;
+        var matches = [];
+        for (var i = 0; i < all.length; i++) {
+            if (norm(all[i].textContent) === target) matches.push(all[i]);
+        }
+        var minimal = matches.filter(function(el) {
+            return !matches.some(function(other) {
+                return other !== el && el.contains(other);
+            });
+        });
+        if (minimal.length !== 1 || minimal[0].children.length !== 0) return false;
+        minimal[0].textContent = pairs[k][1];
+    }
+    return true;
+})(%s)
+"""
+
+
+# Thay body + giữ scroll trong MỘT lần qua bridge thay vì 3 hop.
+# innerHTML không tự chạy lại MathJax như một lần load đầy đủ, nên phải
+# typeset lại tay (API v3 hoặc v2) kẻo công thức rơi về MathML thô
+_SWAP_BODY_JS = """
+(function(bodyHtml) {
+    var y = window.pageYOffset || document.documentElement.scrollTop || 0;
+    document.body.innerHTML = bodyHtml;
+    window.scrollTo(0, y);
+    if (window.MathJax) {
+        if (MathJax.typeset) {
+            MathJax.typeset();
+        } else if (MathJax.Hub && MathJax.Hub.Queue) {
+            MathJax.Hub.Queue(["Typeset", MathJax.Hub]);
+        }
+    }
+})(%s)
+"""
+
+_BODY_RE = re.compile(r"<body[^>]*>(.*)</body>", re.S | re.I)
+# src/href tương đối trong body swap phải trỏ về base dir của render MỚI,
+# vì base URL của trang vẫn là thư mục cũ
+_REL_SRC_RE = re.compile(r'\s(src|href)="(?!https?:|file:|data:|#|/)([^"]+)"', re.I)
+
+
+def _doc_fingerprint(doc) -> bytes:
+    """Cheap content hash of a Document (paragraph texts only)."""
+    return hashlib.blake2b(
+        b"\n".join(p.text.encode("utf-8") for p in doc.paragraphs),
+        digest_size=16,
+    ).digest()
+
+
+# Side markers cho render jobs
+_SIDE_ORIGINAL = 0
+_SIDE_TRANSLATED = 1
+
+
+class _RenderSignals(QObject):
+    finished = pyqtSignal(str, str, int, int)  # html, base, side, generation
+    failed = pyqtSignal(str)
+
+
+class _RenderJob(QRunnable):
+    """Chạy docx_to_html ngoài GUI thread; kết quả trả về qua signal.
+    generation đánh dấu lần upload: job của tài liệu cũ về muộn (lock không
+    FIFO) sẽ bị _on_render_finished bỏ qua thay vì đè lên pane mới."""
+
+    def __init__(self, render_fn, doc, side, generation):
+        super().__init__()
+        self.signals = _RenderSignals()
+        self.done = False
+        self._render_fn = render_fn
+        self._doc = doc
+        self._side = side
+        self._generation = generation
+
+    def run(self):
+        self.done = False
+        try:
+            html, base = self._render_fn(self._doc)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        finally:
+            self.done = True
+        self.signals.finished.emit(html, base, self._side, self._generation)
 
 
 class MainWindow(QMainWindow):
@@ -25,9 +222,22 @@ class MainWindow(QMainWindow):
 
         # --- UI ---
         self.original_view = QWebEngineView()
-        self.original_view.selectionChanged.connect(self.update_selection)
         self.translated_view = QWebEngineView()
 
+        # Selection đẩy từ trang qua QWebChannel; thiếu resource thì quay về
+        # đường selectionChanged + runJavaScript cũ
+        self._selection_sink = _SelectionSink(self._set_selection)
+        self._sel_channel = QWebChannel(self.original_view.page())
+        self._sel_channel.registerObject("selectionSink", self._selection_sink)
+        self.original_view.page().setWebChannel(self._sel_channel)
+        if not self._install_selection_script():
+            # Debounce tương tự cho đường fallback
+            self._sel_timer = QTimer(self)
+            self._sel_timer.setSingleShot(True)
+            self._sel_timer.setInterval(60)
+            self._sel_timer.timeout.connect(self._do_update_selection)
+            self.original_view.selectionChanged.connect(self.update_selection)
+
         splitter = QSplitter()
         splitter.addWidget(self.original_view)
         splitter.addWidget(self.translated_view)
@@ -40,15 +250,7 @@ class MainWindow(QMainWindow):
         lang_layout = QHBoxLayout()
         lang_label = QLabel("Target language:")
         self.lang_combo = QComboBox()
-        langs = [
-            ("English", "en"),
-            ("Vietnamese", "vi"),
-            ("French", "fr"),
-            ("Spanish", "es"),
-            ("German", "de"),
-            ("Chinese (Simplified)", "zh-CN"),
-        ]
-        for name, code in langs:
+        for name, code in _LANGS:
             self.lang_combo.addItem(name, code)
         self.lang_combo.setCurrentIndex(1)
         lang_layout.addWidget(lang_label)
@@ -78,13 +280,35 @@ class MainWindow(QMainWindow):
         self.selection_start = -1
         self.selection_end = -1
 
-        self.segment_map: dict[str, dict] = {}
+        self.segment_map: OrderedDict[str, dict] = OrderedDict()
+
+        # Render cache: content fingerprint -> (html, base dir), LRU có trần
+        self._html_cache: OrderedDict[bytes, tuple[str, str]] = OrderedDict()
+
+        # Click nhanh liên tiếp gom vào một lượt drain thay vì xử lý rời rạc
+        self._pending_translations: list[str] = []
+        self._drain_scheduled = False
 
-        # Scroll-sync state
-        self._pending_scroll_y_right = None
+        # Text index của translated_doc: tìm selection bằng một lần str.find
+        self._para_texts: list[str] = []
+        self._para_starts: list[int] = []
+        self._fulltext = ""
+
+        # Render off-thread: giữ tham chiếu job đang chạy + khoá translator;
+        # generation tăng mỗi lần upload để loại kết quả của tài liệu cũ
+        self._render_jobs: list[_RenderJob] = []
+        self._render_lock = threading.Lock()
+        self._render_generation = 0
+        self._preserve_scroll_on_next_render = False
+
+        # Dịch lại các đoạn đã dịch ở phiên trước thì lấy từ cache, không tốn API
+        self._translation_cache_path = os.path.join(
+            os.path.expanduser("~"), ".docx_translate_cache.pkl"
+        )
 
         try:
             self.translator = TranslatorColumns("translate-tool.json")
+            self.translator.load_cache(self._translation_cache_path)
         except Exception as e:
             QMessageBox.critical(self, "Translator error", str(e))
             self.translator = None
@@ -96,95 +320,121 @@ class MainWindow(QMainWindow):
             return
 
         self.original_doc = Document(fname)
-
-        buffer = BytesIO()
-        self.original_doc.save(buffer)
-        buffer.seek(0)
-        self.translated_doc = Document(buffer)
+        # Đọc file lần hai rẻ hơn serialize + reparse qua BytesIO
+        self.translated_doc = Document(fname)
 
         self.segment_map.clear()
+        self._render_generation += 1
+        self._clear_html_cache()
+        self._rebuild_text_index()
 
-        html1, base1 = self.translator.docx_to_html(self.original_doc)
-        self.original_view.setHtml(html1, QUrl.fromLocalFile(base1 + "/"))
-
-        html2, base2 = self.translator.docx_to_html(self.translated_doc)
-        self.translated_view.setHtml(html2, QUrl.fromLocalFile(base2 + "/"))
+        # Render cả hai pane ngoài GUI thread; setHtml chạy khi signal về
+        self._start_render_job(self.original_doc, _SIDE_ORIGINAL)
+        self._start_render_job(self.translated_doc, _SIDE_TRANSLATED)
 
     # ---------- Selection ----------
+    def _install_selection_script(self) -> bool:
+        """Cài qwebchannel.js + listener vào trang (chạy lại sau mỗi load)."""
+        qwebchannel_js = QFile(":/qtwebchannel/qwebchannel.js")
+        if not qwebchannel_js.open(QIODevice.ReadOnly):
+            return False
+        source = bytes(qwebchannel_js.readAll()).decode("utf-8") + _SELECTION_CHANNEL_JS
+        script = QWebEngineScript()
+        script.setSourceCode(source)
+        script.setInjectionPoint(QWebEngineScript.DocumentReady)
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(False)
+        self.original_view.page().scripts().insert(script)
+        return True
+
+    def _set_selection(self, start: int, end: int):
+        self.selection_start, self.selection_end = start, end
+
     def update_selection(self):
-        js = """
-        (function() {
-            var sel = window.getSelection();
-            if (sel.rangeCount > 0) {
-                var r = sel.getRangeAt(0);
-                var pre = r.cloneRange();
-                pre.selectNodeContents(document.body);
-                pre.setEnd(r.startContainer, r.startOffset);
-                var start = pre.toString().length;
-                var end = start + r.toString().length;
-                return [start,end];
-            }
-            return [-1,-1];
-        })();
-        """
-        self.original_view.page().runJavaScript(js, self.handle_selection_result)
+        self._sel_timer.start()
+
+    def _do_update_selection(self):
+        self.original_view.page().runJavaScript(_SEL_JS, self.handle_selection_result)
 
     def handle_selection_result(self, result):
         if result and len(result) == 2:
-            self.selection_start, self.selection_end = result
+            self._set_selection(*result)
         else:
-            self.selection_start = self.selection_end = -1
+            self._set_selection(-1, -1)
 
-    # ---------- Helper: find selection span across multiple paragraphs ----------
-    def _find_selection_span_across_paragraphs(self, selected_text: str):
-        """
-        Tìm vị trí selected_text (đã strip) trong toàn bộ tài liệu (nối paragraphs bằng ' ').
-        Trả về (first_idx, start_off, last_idx, end_off) nếu tìm thấy; ngược lại None.
-        """
+    # ---------- Text index over translated_doc ----------
+    def _rebuild_text_index(self):
+        """Dựng lại index từ XML: gọi khi mở file mới (O(doc))."""
         if not self.translated_doc:
-            return None
+            self._para_texts, self._para_starts, self._fulltext = [], [], ""
+            return
+        self._para_texts = [p.text for p in self.translated_doc.paragraphs]
+        self._refresh_index_strings()
 
-        par_texts = [p.text for p in self.translated_doc.paragraphs]
-        sep = " "
-        full_text = sep.join(par_texts)
+    def _refresh_index_strings(self):
+        # Bản chuẩn hoá cached cho fallback, khỏi chuẩn hoá lại mỗi click
+        self._norm_para_texts = [_norm(t) for t in self._para_texts]
+        self._rejoin_index_strings()
 
+    def _rejoin_index_strings(self):
+        """Dựng lại các chuỗi nối từ texts hiện có — không chuẩn hoá lại."""
+        starts = []
+        acc = 0
+        for t in self._para_texts:
+            starts.append(acc)
+            acc += len(t) + 1  # +1 cho separator
+        self._para_starts = starts
+        self._fulltext = "\u0001".join(self._para_texts)
+        self._norm_fulltext = _norm(" ".join(self._para_texts))
+
+    def _invalidate_paragraph(self, idx: int):
+        """Sau khi sửa một paragraph, chỉ đọc lại XML và chuẩn hoá đúng đoạn đó."""
+        if 0 <= idx < len(self._para_texts):
+            t = self.translated_doc.paragraphs[idx].text
+            self._para_texts[idx] = t
+            self._norm_para_texts[idx] = _norm(t)
+            self._rejoin_index_strings()
+
+    # ---------- Helper: find selection span ----------
+    def _find_selection_span(self, selected_text: str):
+        """
+        Tìm vị trí selected_text (đã strip) trong translated_doc.
+        Trả về (first_idx, start_off, last_idx, end_off) nếu tìm thấy; ngược lại None.
+        """
         sel = (selected_text or "").strip()
-        if not sel:
+        if not sel or not self._para_texts:
             return None
 
-        def _norm(s: str) -> str:
-            return " ".join(s.split())
+        # Fast path: selection nằm gọn trong một paragraph — một lần str.find
+        # trên fulltext + bisect (separator \x01 không xuất hiện trong selection)
+        pos = self._fulltext.find(sel)
+        if pos != -1:
+            i = bisect_right(self._para_starts, pos) - 1
+            off = pos - self._para_starts[i]
+            return (i, off, i, off + len(sel))
 
-        norm_full = _norm(full_text)
+        # Fallback: chuẩn hoá khoảng trắng (đã cache) rồi map offset theo đoạn gốc
         norm_sel = _norm(sel)
 
-        start = norm_full.find(norm_sel)
+        start = self._norm_fulltext.find(norm_sel)
         if start == -1:
             return None
         end = start + len(norm_sel)
 
-        # Map offset lại theo đoạn gốc
+        # Một lượt duy nhất map cả hai đầu về đoạn gốc, dừng ngay khi đủ
         acc = 0
         first_idx = start_off = None
-        for i, t in enumerate(par_texts):
-            norm_t = _norm(t)
+        last_idx = end_off = None
+        for i, norm_t in enumerate(self._norm_para_texts):
             acc_end = acc + len(norm_t)
-            if start <= acc_end:
+            if first_idx is None and start <= acc_end:
                 first_idx = i
                 start_off = max(start - acc, 0)
-                break
-            acc = acc_end + 1  # cộng thêm khoảng trắng phân tách
-
-        acc = 0
-        last_idx = end_off = None
-        for j, t in enumerate(par_texts):
-            norm_t = _norm(t)
-            acc_end = acc + len(norm_t)
             if end <= acc_end:
-                last_idx = j
+                last_idx = i
                 end_off = max(end - acc, 0)
                 break
-            acc = acc_end + 1
+            acc = acc_end + 1  # cộng thêm khoảng trắng phân tách
 
         if first_idx is None or last_idx is None:
             return None
@@ -199,61 +449,133 @@ class MainWindow(QMainWindow):
         first_idx, start_off, last_idx, end_off = span
         parts = []
 
-        paragraphs = self.translated_doc.paragraphs
+        # Đọc text từ index đã cache, không walk XML lại
+        texts = self._para_texts
 
         if first_idx == last_idx:
-            p = paragraphs[first_idx]
-            piece = p.text[start_off:end_off]
+            piece = texts[first_idx][start_off:end_off]
             parts.append((first_idx, start_off, end_off, piece))
             return parts
 
         # paragraph đầu
-        p0 = paragraphs[first_idx]
-        piece0 = p0.text[start_off:]
-        parts.append((first_idx, start_off, len(p0.text), piece0))
+        piece0 = texts[first_idx][start_off:]
+        parts.append((first_idx, start_off, len(texts[first_idx]), piece0))
 
         # các paragraph giữa
         for i in range(first_idx + 1, last_idx):
-            pi = paragraphs[i]
-            piecei = pi.text
+            piecei = texts[i]
             if piecei:
-                parts.append((i, 0, len(pi.text), piecei))
+                parts.append((i, 0, len(piecei), piecei))
 
         # paragraph cuối
-        pk = paragraphs[last_idx]
-        piecek = pk.text[:end_off]
+        piecek = texts[last_idx][:end_off]
         parts.append((last_idx, 0, end_off, piecek))
 
         return parts
 
-    # ---------- Scroll sync helpers ----------
-    def _reload_translated_view_preserve_scroll(self):
-        """Reload right pane and keep its scroll aligned with left pane."""
-        if not self.translated_doc:
+    # ---------- Render cache ----------
+    def _render_cached(self, doc):
+        """docx_to_html with a fingerprint cache: unchanged content (e.g. the
+        original pane, or re-selecting without a new translation) skips the
+        whole serialize/convert cycle. Serialized under a lock because the
+        translator instance is not thread-safe."""
+        with self._render_lock:
+            key = _doc_fingerprint(doc)
+            cached = self._html_cache.get(key)
+            if cached is not None:
+                self._html_cache.move_to_end(key)
+                return cached
+            pair = self.translator.docx_to_html(doc)
+            self._html_cache[key] = pair
+            # Evict kèm dọn tmpdir: entry cũ giữ cả HTML nhiều MB lẫn một
+            # thư mục trên /dev/shm
+            while len(self._html_cache) > _HTML_CACHE_MAX:
+                _, (_, old_base) = self._html_cache.popitem(last=False)
+                shutil.rmtree(old_base, ignore_errors=True)
+            return pair
+
+    def _clear_html_cache(self):
+        # Lấy render lock: worker thread có thể đang chèn vào chính dict này
+        # và sắp ghi index.html vào một base dir mình định xoá
+        with self._render_lock:
+            for _, base in self._html_cache.values():
+                shutil.rmtree(base, ignore_errors=True)
+            self._html_cache.clear()
+
+    def _start_render_job(self, doc, side: int):
+        # Giữ tham chiếu để job/signals không bị GC khi đang chạy
+        self._render_jobs = [j for j in self._render_jobs if not j.done]
+        job = _RenderJob(self._render_cached, doc, side, self._render_generation)
+        job.signals.finished.connect(self._on_render_finished)
+        job.signals.failed.connect(self._on_render_failed)
+        self._render_jobs.append(job)
+        QThreadPool.globalInstance().start(job)
+
+    def _load_html(self, view, html: str, base: str):
+        """setHtml giới hạn ~2MB và đẩy cả chuỗi HTML qua IPC sang renderer;
+        ghi ra file trong base dir rồi để Chromium stream-parse từ disk."""
+        index_path = os.path.join(base, "index.html")
+        try:
+            with open(index_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+                f.write(html)
+        except OSError:
+            view.setHtml(html, QUrl.fromLocalFile(base + "/"))
             return
-        html, base = self.translator.docx_to_html(self.translated_doc)
+        view.load(QUrl.fromLocalFile(index_path))
+
+    def _on_render_finished(self, html: str, base: str, side: int, generation: int):
+        if generation != self._render_generation:
+            return  # kết quả của tài liệu đã bị thay — bỏ
+        if side == _SIDE_ORIGINAL:
+            self._load_html(self.original_view, html, base)
+        elif self._preserve_scroll_on_next_render:
+            self._preserve_scroll_on_next_render = False
+            self._set_translated_html_preserve_scroll(html, base)
+        else:
+            self._load_html(self.translated_view, html, base)
 
-        js_get_scroll_y = "Math.round(window.pageYOffset || document.documentElement.scrollTop || document.body.scrollTop || 0);"
+    def _on_render_failed(self, message: str):
+        QMessageBox.critical(self, "Render error", message)
 
-        def _got_left_y(y):
-            try:
-                self.translated_view.loadFinished.disconnect(self._on_right_load_finished_set_scroll)
-            except Exception:
-                pass
-            self._pending_scroll_y_right = int(y) if isinstance(y, (int, float)) else 0
-            self.translated_view.loadFinished.connect(self._on_right_load_finished_set_scroll)
-            self.translated_view.setHtml(html, QUrl.fromLocalFile(base + "/"))
+    # ---------- Targeted DOM patch ----------
+    def _apply_paragraph_patches(self, pairs: list[tuple[str, str]]):
+        """Swap changed paragraphs in place in the right pane. Any pair that
+        cannot be located unambiguously triggers the full-reload fallback."""
+        pairs = [(old, new) for old, new in pairs if old != new]
+        if not pairs:
+            return
 
-        self.original_view.page().runJavaScript(js_get_scroll_y, _got_left_y)
+        def _done(ok):
+            if ok is not True:
+                self._reload_translated_view_preserve_scroll()
 
-    def _on_right_load_finished_set_scroll(self, ok):
-        y = int(self._pending_scroll_y_right or 0)
-        self.translated_view.page().runJavaScript(f"window.scrollTo(0, {y});")
-        self._pending_scroll_y_right = None
-        try:
-            self.translated_view.loadFinished.disconnect(self._on_right_load_finished_set_scroll)
-        except Exception:
-            pass
+        js = _PATCH_PARAS_JS % json.dumps(pairs)
+        self.translated_view.page().runJavaScript(js, _done)
+
+    # ---------- Scroll sync helpers ----------
+    def _reload_translated_view_preserve_scroll(self):
+        """Reload right pane and keep its scroll aligned with left pane.
+        The render itself runs off-thread; the scroll dance happens when the
+        finished signal arrives."""
+        if not self.translated_doc:
+            return
+        self._preserve_scroll_on_next_render = True
+        self._start_render_job(self.translated_doc, _SIDE_TRANSLATED)
+
+    def _set_translated_html_preserve_scroll(self, html: str, base: str):
+        """One bridge crossing: JS reads its own scroll, swaps the body and
+        scrolls back — no loadFinished connect/disconnect dance. The <head>
+        is static CSS, identical across renders, so body-only swap is safe."""
+        m = _BODY_RE.search(html)
+        if not m:
+            self._load_html(self.translated_view, html, base)
+            return
+        base_url = QUrl.fromLocalFile(base + "/").toString()
+        body = _REL_SRC_RE.sub(
+            lambda mm: ' %s="%s%s"' % (mm.group(1), base_url, mm.group(2)),
+            m.group(1),
+        )
+        self.translated_view.page().runJavaScript(_SWAP_BODY_JS % json.dumps(body))
 
     # ---------- Translate selected ----------
     def translate_selected(self):
@@ -271,72 +593,119 @@ class MainWindow(QMainWindow):
     def _translate_callback(self, selected_text: str):
         if not selected_text or not selected_text.strip():
             return
-
-        key = _norm_key(selected_text)
+        # Gom click: mọi selection đến trong cùng cửa sổ 30ms drain chung một lượt
+        self._pending_translations.append(selected_text)
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            QTimer.singleShot(30, self._drain_translate_queue)
+
+    def _drain_translate_queue(self):
+        self._drain_scheduled = False
+        pending, self._pending_translations = self._pending_translations, []
+        patch_pairs = []
         try:
-            target_lang = self.lang_combo.currentData()
-
-            replaced = False
-            para_idx_used = None
-
-            # --- Case 1: Thay trong 1 paragraph ---
-            for idx, p in enumerate(self.translated_doc.paragraphs):
-                pos = p.text.find(selected_text.strip())
+            # Giữ render lock khi sửa translated_doc: render job ngoài thread
+            # đang đọc cùng cây XML thì không được đổi dưới chân nó
+            with self._render_lock:
+                for selected_text in pending:
+                    patch_pairs.extend(self._translate_one_selection(selected_text))
+        except Exception as e:
+            QMessageBox.critical(self, "Translation error", str(e))
+        finally:
+            # Những selection đã thay vào document thì pane phải phản ánh,
+            # kể cả khi một selection sau đó lỗi
+            self._apply_paragraph_patches(patch_pairs)
+
+    def _seg_put(self, key: str, para_idx: int, last_text: str = ""):
+        """Ghi segment_map có trần: LRU, bỏ luôn last_text rỗng."""
+        info = {"para_idx": para_idx}
+        if last_text:
+            info["last_text"] = last_text
+        self.segment_map[key] = info
+        self.segment_map.move_to_end(key)
+        while len(self.segment_map) > _SEGMENT_MAP_MAX:
+            self.segment_map.popitem(last=False)
+
+    def _translate_one_selection(self, selected_text: str) -> list[tuple[str, str]]:
+        """Locate and replace one selection; returns the (old, new) paragraph
+        texts to patch in the right pane."""
+        key = _norm_key(selected_text)
+        target_lang = self.lang_combo.currentData()
+        # Strip một lần cho cả hàm thay vì mỗi chỗ dùng
+        stripped = selected_text.strip()
+        stripped_len = len(stripped)
+
+        replaced = False
+        para_idx_used = None
+        patch_pairs = []
+
+        # --- Case 1: Thay trong 1 paragraph (tìm qua index, không quét từng đoạn) ---
+        pos = self._fulltext.find(stripped)
+        if pos != -1:
+            idx = bisect_right(self._para_starts, pos) - 1
+            p = self.translated_doc.paragraphs[idx]
+            local = pos - self._para_starts[idx]
+            new_text = self.translator.translate_text(selected_text, target_lang)
+            old_para_text = self._para_texts[idx]
+            replace_text_in_paragraph(p, local, local + stripped_len, new_text)
+            self._invalidate_paragraph(idx)
+            patch_pairs.append((old_para_text, self._para_texts[idx]))
+            replaced = True
+            para_idx_used = idx
+            self._seg_put(key, para_idx_used, new_text)
+
+        # --- Case 2: Dựa trên segment_map ---
+        if not replaced and key in self.segment_map:
+            info = self.segment_map[key]
+            pi = info.get("para_idx")
+            last = info.get("last_text", "")
+            if isinstance(pi, int) and 0 <= pi < len(self.translated_doc.paragraphs) and last:
+                p = self.translated_doc.paragraphs[pi]
+                old_para_text = self._para_texts[pi]
+                pos = old_para_text.find(last)
                 if pos != -1:
                     new_text = self.translator.translate_text(selected_text, target_lang)
-                    replace_text_in_paragraph(p, pos, pos + len(selected_text.strip()), new_text)
+                    replace_text_in_paragraph(p, pos, pos + len(last), new_text)
+                    self._invalidate_paragraph(pi)
+                    patch_pairs.append((old_para_text, self._para_texts[pi]))
                     replaced = True
-                    para_idx_used = idx
-                    self.segment_map[key] = {"para_idx": para_idx_used, "last_text": new_text}
-                    break
-
-            # --- Case 2: Dựa trên segment_map ---
-            if not replaced and key in self.segment_map:
-                info = self.segment_map[key]
-                pi = info.get("para_idx")
-                last = info.get("last_text", "")
-                if isinstance(pi, int) and 0 <= pi < len(self.translated_doc.paragraphs) and last:
+                    para_idx_used = pi
+                    self._seg_put(key, para_idx_used, new_text)
+
+        # --- Case 3: Fallback multi-paragraph: dịch cả batch trong 1 request ---
+        if not replaced:
+            span = self._find_selection_span(selected_text)
+            if span is not None:
+                parts = self._split_selection_by_paragraphs(span, selected_text)
+                if not parts:
+                    QMessageBox.warning(self, "Not found",
+                                        "Could not locate the segment to replace in the translated document.")
+                    return []
+
+                pieces = [piece for (_, _, _, piece) in parts]
+                translated_pieces = self.translator.translate_batch(pieces, target_lang)
+                for (pi, s, e, piece_text), translated_piece in zip(parts, translated_pieces):
                     p = self.translated_doc.paragraphs[pi]
-                    pos = p.text.find(last)
-                    if pos != -1:
-                        new_text = self.translator.translate_text(selected_text, target_lang)
-                        replace_text_in_paragraph(p, pos, pos + len(last), new_text)
-                        replaced = True
+                    if not (piece_text and piece_text.strip()):
+                        translated_piece = piece_text
+                    old_para_text = self._para_texts[pi]
+                    replace_text_in_paragraph(p, s, e, translated_piece)
+                    self._para_texts[pi] = p.text
+                    self._norm_para_texts[pi] = _norm(p.text)
+                    patch_pairs.append((old_para_text, self._para_texts[pi]))
+                    if para_idx_used is None:
                         para_idx_used = pi
-                        self.segment_map[key] = {"para_idx": para_idx_used, "last_text": new_text}
-
-            # --- Case 3: Fallback multi-paragraph: dịch theo TỪNG ĐOẠN ---
-            if not replaced:
-                span = self._find_selection_span_across_paragraphs(selected_text)
-                if span is not None:
-                    parts = self._split_selection_by_paragraphs(span, selected_text)
-                    if not parts:
-                        QMessageBox.warning(self, "Not found",
-                                            "Could not locate the segment to replace in the translated document.")
-                        return
-
-                    for (pi, s, e, piece_text) in parts:
-                        if piece_text and piece_text.strip():
-                            translated_piece = self.translator.translate_text(piece_text, target_lang)
-                        else:
-                            translated_piece = piece_text
-                        replace_text_in_paragraph(self.translated_doc.paragraphs[pi], s, e, translated_piece)
-                        if para_idx_used is None:
-                            para_idx_used = pi
 
-                    replaced = True
-                    self.segment_map[key] = {"para_idx": para_idx_used, "last_text": ""}
-
-            if not replaced:
-                QMessageBox.warning(self, "Not found",
-                                    "Could not locate the segment to replace in the translated document.")
-                return
+                self._rejoin_index_strings()
+                replaced = True
+                self._seg_put(key, para_idx_used)
 
-            # Reload right pane and keep scroll position aligned with the left
-            self._reload_translated_view_preserve_scroll()
+        if not replaced:
+            QMessageBox.warning(self, "Not found",
+                                "Could not locate the segment to replace in the translated document.")
+            return []
 
-        except Exception as e:
-            QMessageBox.critical(self, "Translation error", str(e))
+        return patch_pairs
 
     # ---------- Download DOCX ----------
     def download_file(self):
@@ -350,7 +719,9 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         try:
-            if self.translator and hasattr(self.translator, "cleanup_all_tmp"):
-                self.translator.cleanup_all_tmp()
+            if self.translator:
+                self.translator.save_cache(self._translation_cache_path)
+                if hasattr(self.translator, "cleanup_all_tmp"):
+                    self.translator.cleanup_all_tmp()
         finally:
             super().closeEvent(event)
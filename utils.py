@@ -1,56 +1,50 @@
 # Functions to replace text in a docx file
+from bisect import bisect_left
+from itertools import accumulate
+
 from docx import Document
 
 def replace_text_in_paragraph(paragraph, start_pos, end_pos, replace_text):
     full_text = paragraph.text
     n = len(full_text)
     start_pos = max(0, min(start_pos, n))
-    end_pos   = max(start_pos, min(end_pos, n)) 
+    end_pos   = max(start_pos, min(end_pos, n))
 
+    runs = paragraph.runs
     if start_pos == 0 and end_pos >= n:
-        for r in paragraph.runs:
+        for r in runs:
             r.text = ''
         paragraph.add_run(replace_text)
         return True
 
-    text_len = 0
-    start_run = end_run = None
-    start_off = end_off = 0
-    for run in paragraph.runs:
-        run_len = len(run.text)
-        run_start = text_len
-        run_end = text_len + run_len
-
-        if start_run is None and start_pos <= run_end:
-            start_run = run
-            start_off = max(start_pos - run_start, 0)
-        if end_run is None and end_pos <= run_end:
-            end_run = run
-            end_off = min(end_pos - run_start, run_len)
+    # Snapshot run texts một lần (mỗi lần đọc run.text là một lượt XML),
+    # offsets cộng dồn + bisect thay cho quét tuyến tính từng run
+    run_texts = [r.text for r in runs]
+    ends = list(accumulate(map(len, run_texts)))
+    total = ends[-1] if ends else 0
 
-        text_len += run_len
-
-    if start_run is None or end_run is None:
+    if not ends or start_pos > total or end_pos > total:
+        # Offsets tính theo paragraph.text có thể vượt quá phần nằm trong runs
+        # (ví dụ text trong hyperlink); dựng lại cả đoạn như trước
         prefix = full_text[:start_pos]
         suffix = full_text[end_pos:]
-        for r in paragraph.runs:
+        for r in runs:
             r.text = ''
         paragraph.add_run(prefix + replace_text + suffix)
         return True
 
-    if start_run == end_run:
-        start_run.text = start_run.text[:start_off] + replace_text + start_run.text[end_off:]
+    start_idx = bisect_left(ends, start_pos)
+    end_idx = bisect_left(ends, end_pos)
+    start_off = max(start_pos - (ends[start_idx - 1] if start_idx else 0), 0)
+    end_off = min(end_pos - (ends[end_idx - 1] if end_idx else 0), len(run_texts[end_idx]))
+
+    if start_idx == end_idx:
+        t = run_texts[start_idx]
+        runs[start_idx].text = t[:start_off] + replace_text + t[end_off:]
         return True
 
-    start_run.text = start_run.text[:start_off] + replace_text
-    clear = False
-    for run in paragraph.runs:
-        if run is start_run:
-            clear = True
-            continue
-        if run is end_run:
-            run.text = run.text[end_off:]
-            break
-        if clear:
-            run.text = ''
+    runs[start_idx].text = run_texts[start_idx][:start_off] + replace_text
+    for r in runs[start_idx + 1:end_idx]:
+        r.text = ''
+    runs[end_idx].text = run_texts[end_idx][end_off:]
     return True